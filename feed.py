@@ -0,0 +1,347 @@
+import argparse, http.client, json, logging, os, pickle, queue, socket, socketserver, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib import request as urlrequest
+from urllib.error import URLError
+
+"""
+@author: aryan-jain
+@version: 0.1
+@description:
+    A change feed for the ELO leaderboards.
+
+    Every game applied by ping_pong.py is published as a compact delta event
+    containing only the rows whose rank or rating moved. A long-running
+    `feed.py --mode serve` process fans those events out to any number of
+    subscribers, either as a server-sent events stream (GET /events) or as
+    newline-delimited JSON on a plain TCP socket.
+
+    New subscribers receive one full `snapshot` event so they can draw the
+    table, followed by `delta` events only. The broker recomputes each delta
+    against the leaderboard pickle, so games it missed are still reflected,
+    and drops deltas in which no row moved.
+    Subscriber threads block on their queue and only wake every 15 seconds
+    to send a keepalive, which also clears out displays that disconnected.
+"""
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+KEEPALIVE = 15
+
+LEADERBOARDS = {
+    'singles': 'elo_leaderboard.pkl',
+    'doubles': 'elo_doubles_leaderboard.pkl',
+}
+
+ROW_KEYS = {'name', 'rank', 'previous_rank', 'rating', 'rating_change'}
+
+logger = logging.getLogger('ping_pong_feed')
+
+
+def standings(leaderboard: list) -> dict:
+    """Takes a list of Player objects and returns their standings
+    keyed by player name.
+
+    Arguments:
+        leaderboard {list[Player]}
+
+    Returns:
+        dict -- {name: {'rank': int, 'rating': float}}
+    """
+    ranked = sorted(leaderboard, key=lambda p: p.rating, reverse=True)
+    return {
+        p.name: {'rank': num + 1, 'rating': p.rating}
+        for num, p in enumerate(ranked)
+    }
+
+
+def standings_delta(before: dict, after: dict, players: list, style: str = "singles", date=None) -> dict:
+    """Builds a delta event containing only the rows that moved between
+    two standings snapshots.
+
+    Arguments:
+        before {dict} -- standings() before the game was applied
+        after {dict} -- standings() after the game was applied
+        players {list[str]} -- names of the players in the game
+
+    Returns:
+        dict
+    """
+    rows = []
+    for name, row in after.items():
+        old = before.get(name)
+        if old is not None and old['rank'] == row['rank'] and old['rating'] == row['rating']:
+            continue
+        rows.append({
+            'name': name,
+            'rank': row['rank'],
+            'previous_rank': old['rank'] if old else None,
+            'rating': row['rating'],
+            'rating_change': row['rating'] - old['rating'] if old else None,
+        })
+    rows.sort(key=lambda r: r['rank'])
+    return {
+        'type': 'delta',
+        'style': style,
+        'players': players,
+        'date': date.strftime('%Y-%m-%d %H:%M') if date else None,
+        'rows': rows,
+    }
+
+
+def publish(event: dict, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, timeout: float = 1.0) -> bool:
+    """Sends a delta event to a running feed server. Failing to reach the
+    server is not an error; the leaderboard pickle remains the source of truth.
+
+    Returns:
+        bool -- True if the server accepted the event
+    """
+    req = urlrequest.Request(
+        f"http://{host}:{port}/publish",
+        data=json.dumps(event).encode(),
+        headers={'Content-Type': 'application/json'},
+        method='POST')
+    try:
+        with urlrequest.urlopen(req, timeout=timeout) as resp:
+            return resp.status == 204
+    except (URLError, OSError, http.client.HTTPException) as e:
+        logger.debug(f"Could not publish standings delta to {host}:{port}: {e}")
+        return False
+
+
+def valid_delta(event) -> bool:
+    """Checks that a published event has the shape and value types built
+    by standings_delta()."""
+    number = lambda v: isinstance(v, (int, float)) and not isinstance(v, bool)
+    valid_row = lambda r: (
+        isinstance(r, dict)
+        and set(r) == ROW_KEYS
+        and isinstance(r['name'], str)
+        and isinstance(r['rank'], int) and not isinstance(r['rank'], bool)
+        and number(r['rating'])
+        and (r['previous_rank'] is None or (isinstance(r['previous_rank'], int) and not isinstance(r['previous_rank'], bool)))
+        and (r['rating_change'] is None or number(r['rating_change']))
+    )
+    return (
+        isinstance(event, dict)
+        and event.get('type') == 'delta'
+        and event.get('style') in LEADERBOARDS
+        and isinstance(event.get('players'), list)
+        and all(isinstance(p, str) for p in event['players'])
+        and (event.get('date') is None or isinstance(event['date'], str))
+        and isinstance(event.get('rows'), list)
+        and all(valid_row(r) for r in event['rows'])
+    )
+
+
+class Broker(object):
+
+    def __init__(self, path: str):
+        self.path = path
+        self.disk = {}
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        # Standings as last broadcast to subscribers.
+        self.state = {}
+        for style in LEADERBOARDS:
+            new = self._read(style)
+            if new is not None:
+                self.state[style] = new
+
+    def _read(self, style: str):
+        """Reads a leaderboard pickle, re-using the last read while its
+        mtime is unchanged. Games reported while the server was down, or
+        whose publish failed, never reach the broker as events, so the
+        pickle is the source of truth. Must be called with the lock held.
+
+        Returns:
+            dict -- standings(), or None if the pickle cannot be read
+        """
+        f = f"{self.path}/{LEADERBOARDS[style]}"
+        try:
+            mtime = os.stat(f).st_mtime_ns
+            if style in self.disk and self.disk[style][0] == mtime:
+                return self.disk[style][1]
+            with open(f, 'rb') as fh:
+                new = standings(pickle.load(fh))
+        except OSError:
+            logger.debug(f"No {style} leaderboard found at {f}")
+            return None
+        except Exception as e:
+            logger.warning(f"Could not read {f} ({e!r}); keeping the previous {style} standings")
+            return None
+        self.disk[style] = (mtime, new)
+        return new
+
+    def _broadcast(self, event: dict):
+        for q in self.subscribers:
+            q.put(event)
+
+    def subscribe(self):
+        """Registers a new subscriber and returns its queue, primed with
+        a snapshot of the current standings. The snapshot is read fresh from
+        disk, but the broadcast state is left alone so that a game written
+        just before its publish arrives still goes out as a delta to the
+        existing subscribers."""
+        q = queue.Queue()
+        with self.lock:
+            snapshot = {}
+            for style in LEADERBOARDS:
+                new = self._read(style)
+                if new is None:
+                    new = self.state.get(style)
+                if new is not None:
+                    snapshot[style] = new
+            q.put({'type': 'snapshot', 'standings': snapshot})
+            self.subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self.lock:
+            self.subscribers.discard(q)
+
+    def publish(self, event: dict):
+        """Forwards a game's delta. The rows are recomputed from the
+        leaderboard on disk so that any missed games are included. Deltas
+        in which no row moved are not broadcast."""
+        style = event['style']
+        with self.lock:
+            new = self._read(style)
+            if new is not None:
+                event = {**event, 'rows': standings_delta(self.state.get(style, {}), new, event['players'], style=style)['rows']}
+            else:
+                new = dict(self.state.get(style, {}))
+                for row in event['rows']:
+                    new[row['name']] = {'rank': row['rank'], 'rating': row['rating']}
+            self.state = {**self.state, style: new}
+            if event['rows']:
+                self._broadcast(event)
+
+
+class SSEHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path != '/events':
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        q = self.server.broker.subscribe()
+        try:
+            while True:
+                try:
+                    event = q.get(timeout=KEEPALIVE)
+                    self.wfile.write(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode())
+                except queue.Empty:
+                    self.wfile.write(b": keepalive\n\n")
+                self.wfile.flush()
+        except OSError:
+            pass
+        finally:
+            self.server.broker.unsubscribe(q)
+
+    def do_POST(self):
+        if self.path != '/publish':
+            self.send_error(404)
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            if length < 0:
+                raise ValueError(length)
+            event = json.loads(self.rfile.read(length))
+        except ValueError:
+            event = None
+        if not valid_delta(event):
+            self.send_error(400, "Expected a delta event")
+            return
+        self.server.broker.publish(event)
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class SocketHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        q = self.server.broker.subscribe()
+        try:
+            while True:
+                try:
+                    event = q.get(timeout=KEEPALIVE)
+                except queue.Empty:
+                    event = {'type': 'keepalive'}
+                self.wfile.write(json.dumps(event).encode() + b"\n")
+                self.wfile.flush()
+        except OSError:
+            pass
+        finally:
+            self.server.broker.unsubscribe(q)
+
+
+class ThreadingSocketServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def serve(path: str, host: str, port: int):
+    broker = Broker(path)
+
+    http = ThreadingHTTPServer((host, port), SSEHandler)
+    http.daemon_threads = True
+    http.broker = broker
+    sock = ThreadingSocketServer((host, port + 1), SocketHandler)
+    sock.broker = broker
+
+    threading.Thread(target=sock.serve_forever, daemon=True).start()
+    logger.info(f"Serving server-sent events at http://{host}:{port}/events")
+    logger.info(f"Serving newline-delimited JSON on {host}:{port + 1}")
+    try:
+        http.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sock.shutdown()
+        http.server_close()
+        sock.server_close()
+
+
+def watch(host: str, port: int, style: str):
+    """Subscribes over the plain socket and prints only the rows that move."""
+    with socket.create_connection((host, port + 1)) as conn:
+        for line in conn.makefile('r'):
+            event = json.loads(line)
+            if event['type'] == 'snapshot':
+                for name, row in sorted(event['standings'].get(style, {}).items(), key=lambda r: r[1]['rank']):
+                    print(f"{row['rank']:>3}  {name:<24}{row['rating']:>10.2f}")
+            elif event['type'] == 'delta' and event['style'] == style and event['rows']:
+                print(f"\n{' vs. '.join(event['players'])} ({event['date']}):")
+                for row in event['rows']:
+                    change = f"{row['rating_change']:+.2f}" if row['rating_change'] is not None else "new"
+                    print(f"{row['rank']:>3}  {row['name']:<24}{row['rating']:>10.2f}  {change}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--path', '-p', default='.', help='Path to the leaderboard pickles.')
+    parser.add_argument('--style', '-s', default='singles', choices=['singles', 'doubles'], help='Game format to watch.')
+    parser.add_argument('--host', default=DEFAULT_HOST, help='Feed server host.')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+            help='Port for server-sent events. The plain socket feed listens on the next port.')
+    parser.add_argument('--log', '-l', default='INFO',
+            choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'], help='Log level.')
+    parser.add_argument('--mode', '-m', default='serve', choices=['serve', 'watch'], help='Run the feed server or follow it?')
+
+    args = parser.parse_args()
+
+    logging.basicConfig(
+            level=args.log,
+            format='%(asctime)s - %(levelname)s - %(name)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S')
+
+    if args.mode == 'serve':
+        serve(args.path, args.host, args.port)
+    else:
+        watch(args.host, args.port, args.style)
@@ -0,0 +1,315 @@
+import argparse, logging, os, pickle, sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+from player import Player
+
+"""
+@author: aryan-jain
+@version: 0.1
+@description:
+    Migrates old seasons into the current leaderboard format.
+
+    Each source directory is treated as one season and may contain any of:
+        elo_leaderboard.pkl, elo_doubles_leaderboard.pkl -- pickled Player lists
+        leaderboard_singles.pkl, leaderboard_doubles.pkl -- pandas DataFrames
+            written by .deprecated.py
+
+    Every archive is converted in its own worker process and written to
+    {out}/{season}/ as a pickled list of Player objects, so ping_pong.py can
+    be pointed at a migrated season with --path. Player, win and loss counts
+    are taken from the raw source (the DataFrame, or each player's game log)
+    and checked against the written file before it is moved into place and
+    added to the combined index at {out}/index.pkl.
+
+    The legacy DataFrames used a flat +5/+7/+10 rating scheme starting at
+    1440 and kept no game log, so their ratings are carried over as-is and
+    tagged with scheme 'legacy' in the index rather than mixed into the best
+    ELO ratings. Only season-end ratings are kept, so that is the best rating
+    a cross-season query can report.
+"""
+
+ARCHIVES = {
+    'elo_leaderboard.pkl': ('singles', 'elo'),
+    'elo_doubles_leaderboard.pkl': ('doubles', 'elo'),
+    'leaderboard_singles.pkl': ('singles', 'legacy'),
+    'leaderboard_doubles.pkl': ('doubles', 'legacy'),
+}
+
+OUTPUT = {
+    'singles': 'elo_leaderboard.pkl',
+    'doubles': 'elo_doubles_leaderboard.pkl',
+}
+
+logger = logging.getLogger('ping_pong_migrate')
+
+
+class MigrationError(Exception):
+    pass
+
+
+def load_legacy(path: str) -> tuple:
+    """Converts a .deprecated.py DataFrame leaderboard into Player objects.
+
+    Arguments:
+        path {str} -- path to a leaderboard_{style}.pkl
+
+    Returns:
+        tuple -- (list[Player], (players, won, lost) counted from the DataFrame)
+    """
+    df = pd.read_pickle(path)
+    players = []
+    for name, row in df.iterrows():
+        p = Player(str(name).title())
+        p.rating = float(row['Rating'])
+        p.won = int(row['Won'])
+        p.lost = int(row['Lost'])
+        players.append(p)
+    return players, (len(df), int(df['Won'].sum()), int(df['Lost'].sum()))
+
+
+def load_elo(path: str) -> tuple:
+    """Loads a pickled Player list, checking each player's won and lost
+    counters against their game log. Inactivity penalties are logged as
+    games with no winner and do not count as losses.
+
+    Arguments:
+        path {str} -- path to an elo_*leaderboard.pkl
+
+    Returns:
+        tuple -- (list[Player], (players, won, lost) counted from the game logs)
+    """
+    names = lambda side: [p.name for p in side] if isinstance(side, list) else [side]
+    with open(path, 'rb') as f:
+        players = pickle.load(f)
+    won = lost = 0
+    for p in players:
+        w = len([g for g in p.games if p.name in names(g['winner'])])
+        l = len([g for g in p.games if g['winner'] != "" and p.name in names(g['loser'])])
+        if (p.won, p.lost) != (w, l):
+            raise MigrationError(f"{p.name} in {path} is {p.won}-{p.lost} but their game log shows {w}-{l}")
+        won += w
+        lost += l
+    return players, (len(players), won, lost)
+
+
+def find_archives(sources: list) -> list:
+    """Lists every archive found in the source directories.
+
+    Arguments:
+        sources {list[str]} -- directories, optionally given as season=path
+
+    Returns:
+        list[tuple] -- (season, style, scheme, path)
+    """
+    archives = []
+    empty = []
+    for source in sources:
+        season, _, path = source.rpartition('=')
+        season = season or os.path.basename(os.path.abspath(path))
+        found = [(f, style, scheme) for f, (style, scheme) in ARCHIVES.items() if os.path.exists(os.path.join(path, f))]
+        # Legacy boards use a different rating scheme, so a directory that
+        # also holds ELO boards has all of its legacy boards migrated as a
+        # separate season.
+        if not found:
+            empty.append(path)
+            continue
+        has_elo = any(scheme == 'elo' for _, _, scheme in found)
+        for f, style, scheme in found:
+            archive_season = f"{season}-legacy" if scheme == 'legacy' and has_elo else season
+            archives.append((archive_season, style, scheme, os.path.join(path, f)))
+
+    if empty:
+        raise MigrationError(f"No leaderboard archives found in {', '.join(empty)}")
+
+    targets = {}
+    for season, style, _, path in archives:
+        targets.setdefault((season, style), []).append(path)
+    clashes = [f"{season} {style}: {', '.join(paths)}" for (season, style), paths in targets.items() if len(paths) > 1]
+    if clashes:
+        raise MigrationError(
+            "More than one archive maps to the same season; name them with season=path.\n\t" + "\n\t".join(clashes))
+    return archives
+
+
+def migrate_archive(season: str, style: str, scheme: str, path: str, out: str) -> list:
+    """Converts a single archive and writes it under {out}/{season}/. The
+    file is only moved into place once its record counts match the source.
+
+    Returns:
+        list[dict] -- one index record per player
+    """
+    players, expected = load_legacy(path) if scheme == 'legacy' else load_elo(path)
+
+    names = [p.name.title() for p in players]
+    duplicates = sorted({n for n in names if names.count(n) > 1})
+    if duplicates:
+        raise MigrationError(f"{path} lists {', '.join(duplicates)} more than once")
+
+    dest = os.path.join(out, season, OUTPUT[style])
+    if os.path.exists(dest):
+        # Left behind by a run that stopped before indexing it; keep it only
+        # if it still matches the source.
+        with open(dest, 'rb') as f:
+            written = pickle.load(f)
+        found = (len(written), sum(p.won for p in written), sum(p.lost for p in written))
+        if found != expected:
+            raise MigrationError(f"{dest} already exists and holds (players, won, lost) = {found}, expected {expected} from {path}")
+        logger.info(f"Re-indexing existing {dest}")
+    else:
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        tmp = f"{dest}.tmp"
+        try:
+            with open(tmp, 'wb') as f:
+                pickle.dump(players, f)
+                f.flush()
+                os.fsync(f.fileno())
+            with open(tmp, 'rb') as f:
+                written = pickle.load(f)
+            found = (len(written), sum(p.won for p in written), sum(p.lost for p in written))
+            if found != expected:
+                raise MigrationError(f"{dest} would hold (players, won, lost) = {found}, expected {expected} from {path}")
+            os.replace(tmp, dest)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    return [
+        {
+            'name': p.name.title(),
+            'season': season,
+            'style': style,
+            'scheme': scheme,
+            'rating': p.rating,
+            'won': p.won,
+            'lost': p.lost,
+            'first_game': min([g['date'] for g in p.games], default=None),
+            'last_game': max([g['date'] for g in p.games], default=None),
+        }
+        for p in written
+    ]
+
+
+def migrate(sources: list, out: str, workers: int = None) -> tuple:
+    """Migrates every archive in parallel, adding each one to the combined
+    index as soon as it completes. Archives already in the index are skipped,
+    so a partly failed run can simply be repeated.
+
+    Returns:
+        tuple -- (combined index, list of archives that failed)
+    """
+    archives = find_archives(sources)
+
+    index = load_index(out)
+    done = {(r['season'], r['style']) for r in index}
+    for season, style, _, path in archives:
+        if (season, style) in done:
+            logger.info(f"Skipping {path}; season {season} {style} is already migrated")
+    archives = [a for a in archives if (a[0], a[1]) not in done]
+
+    failed = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        jobs = {pool.submit(migrate_archive, *a, out): a for a in archives}
+        for job in as_completed(jobs):
+            season, style, scheme, path = jobs[job]
+            try:
+                records = job.result()
+            except Exception as e:
+                logger.error(f"Could not migrate {path}: {e!r}")
+                failed.append(jobs[job])
+                continue
+            index.extend(records)
+            save_index(out, index)
+            logger.info(f"Migrated {len(records)} {style} players from {path} into season {season}")
+    return index, failed
+
+
+def load_index(out: str) -> list:
+    try:
+        with open(os.path.join(out, 'index.pkl'), 'rb') as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return []
+
+
+def save_index(out: str, index: list):
+    os.makedirs(out, exist_ok=True)
+    tmp = os.path.join(out, 'index.pkl.tmp')
+    with open(tmp, 'wb') as f:
+        pickle.dump(index, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(out, 'index.pkl'))
+
+
+def career_record(index: list, name: str, style: str = None) -> dict:
+    """Totals a player's wins and losses across every season.
+
+    Arguments:
+        index {list[dict]}
+        name {str} -- full or partial player name
+
+    Returns:
+        dict -- {name: {'Won': int, 'Lost': int, 'Seasons': int}}
+    """
+    record = {}
+    for r in index:
+        if name.lower() in r['name'].lower() and style in (None, r['style']):
+            totals = record.setdefault(r['name'], {'Won': 0, 'Lost': 0, 'Seasons': set()})
+            totals['Won'] += r['won']
+            totals['Lost'] += r['lost']
+            totals['Seasons'].add(r['season'])
+    return {n: {**t, 'Seasons': len(t['Seasons'])} for n, t in record.items()}
+
+
+def best_season_rating(index: list, name: str, style: str = None, include_legacy: bool = False) -> dict:
+    """Finds each matching player's best season-end rating. Ratings within
+    a season are not recorded, so this is not necessarily their peak.
+
+    Returns:
+        dict -- {name: {'Rating': float, 'Season': str, 'Style': str}}
+    """
+    best = {}
+    for r in index:
+        if r['scheme'] == 'legacy' and not include_legacy:
+            continue
+        if name.lower() in r['name'].lower() and style in (None, r['style']):
+            if r['name'] not in best or r['rating'] > best[r['name']]['Rating']:
+                best[r['name']] = {'Rating': r['rating'], 'Season': r['season'], 'Style': r['style']}
+    return best
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('sources', nargs='*', help='Season directories to migrate, optionally as season=path.')
+    parser.add_argument('--out', '-o', default='seasons', help='Directory to write migrated seasons to.')
+    parser.add_argument('--workers', '-w', type=int, default=None, help='Number of worker processes.')
+    parser.add_argument('--player', help='Show career record and best season-end rating for a player.')
+    parser.add_argument('--style', '-s', default=None, choices=['singles', 'doubles'], help='Restrict queries to a game format.')
+    parser.add_argument('--log', '-l', default='INFO',
+            choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'], help='Log level.')
+
+    args = parser.parse_args()
+
+    logging.basicConfig(
+            level=args.log,
+            format='%(asctime)s - %(levelname)s - %(name)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S')
+
+    if args.sources:
+        try:
+            index, failed = migrate(args.sources, args.out, args.workers)
+        except MigrationError as e:
+            logger.fatal(str(e))
+            sys.exit(1)
+        logger.info(f"Index at {args.out}/index.pkl now holds {len(index)} player-season records")
+        if failed:
+            logger.fatal(f"{len(failed)} archive(s) failed; fix them and re-run to migrate the rest")
+            sys.exit(1)
+    else:
+        index = load_index(args.out)
+
+    if args.player:
+        for name, record in career_record(index, args.player, args.style).items():
+            print(f"{name}: {record}")
+        for name, best in best_season_rating(index, args.player, args.style).items():
+            print(f"{name} best season-end rating: {best['Rating']:.2f} ({best['Style']}, season {best['Season']})")
@@ -4,6 +4,7 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from player import Player, dt_floor
+from feed import standings, standings_delta, publish, DEFAULT_HOST, DEFAULT_PORT
 
 """
 @author: aryan-jain
@@ -155,6 +156,8 @@ if __name__ == '__main__':
     parser.add_argument('--log', '-l', default='INFO',
             choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'], help='Log level.')
     parser.add_argument('--mode', '-m', default='report', choices=['report', 'view'], help='Report game or view leaderboard?')
+    parser.add_argument('--feed-host', default=DEFAULT_HOST, help='Host of the standings change feed.')
+    parser.add_argument('--feed-port', type=int, default=DEFAULT_PORT, help='Port of the standings change feed.')
 
     args = parser.parse_args()
 
@@ -166,6 +169,9 @@ if __name__ == '__main__':
     logger = logging.getLogger('ping_pong_season_4')
 
     path = f"{args.path}/elo_doubles_leaderboard.pkl" if args.style == 'doubles' else f"{args.path}/elo_leaderboard.pkl"
+    # args.style may flip to doubles when a team is entered; the feed must
+    # describe the leaderboard that is actually written to.
+    board_style = args.style
 
     try:
         leaderboard = pickle.load(open(f"{args.path}/elo_leaderboard.pkl", 'rb'))
@@ -185,6 +191,8 @@ if __name__ == '__main__':
     if args.mode == 'view':
         sys.exit()
 
+    before = standings(leaderboard)
+
     now = dt_floor(datetime.now(), scale='minute')
     valid_teams = False
     players = []
@@ -318,6 +326,9 @@ if __name__ == '__main__':
         print()
         print(get_df(leaderboard))
         pickle.dump(leaderboard, open(path, 'wb'))
+        publish(standings_delta(before, standings(leaderboard),
+                [p.name for p in win_team + los_team], style=board_style, date=now),
+                host=args.feed_host, port=args.feed_port)
     else:
         for p in players:
             if p.daily_games() >= 3:
@@ -396,4 +407,7 @@ if __name__ == '__main__':
         print()
         print(get_df(leaderboard))
         pickle.dump(leaderboard, open(path, 'wb'))
+        publish(standings_delta(before, standings(leaderboard),
+                [winner.name, loser.name], style=board_style, date=now),
+                host=args.feed_host, port=args.feed_port)
 